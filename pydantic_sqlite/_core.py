@@ -6,52 +6,321 @@ import os
 import sqlite3
 import tempfile
 import typing
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import partial
 from shutil import copyfile
-from typing import Any, Generator, List, Literal, Union, get_origin
+from typing import (Any, Callable, Dict, Generator, Iterable, List, Literal,
+                    MutableMapping, Optional, Tuple, Union, get_origin)
+from uuid import UUID
 
 from pydantic import BaseModel
 from pydantic._internal._model_construction import ModelMetaclass
 from pydantic.fields import FieldInfo
+from pydantic.functional_serializers import PlainSerializer, WrapSerializer
 from sqlite_utils import Database as _Database
-
-from ._misc import convert_value_into_union_types
+from sqlite_utils.db import Table
+
+from ._misc import convert_value_into_union_types, fsync_path
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# the list columns are encoded with orjson or msgspec if one of them is installed. Both raise on strings which are
+# not valid UTF-8 (e.g. lone surrogates), so such a value fails on write like in the other text columns
+if orjson is not None:
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+    _loads = orjson.loads
+elif msgspec is not None:
+    def _dumps(obj) -> str:
+        return msgspec.json.encode(obj).decode()
+    _loads = msgspec.json.decode
+else:
+    _dumps = json.dumps
+    _loads = json.loads
+
+
+# types which model_dump returns unchanged, so fields of these types are written without a dump
+_PLAIN_TYPES = (str, int, float, bool, bytes, datetime, date, time, timedelta, Decimal, UUID)
 
 SPECIALTYPE = [
     Any,
     Literal,
     Union]
 
+# queries of the hot paths, they are formatted once per table so sqlite3 can reuse the compiled statements
+_SQL_TEMPLATES = {
+    "exists": "SELECT 1 FROM [{table}] WHERE [uuid] = ? LIMIT 1",
+    "get": "SELECT * FROM [{table}] WHERE [uuid] = ? LIMIT 1",
+}
+
+# maximal number of parameters in one "IN (?, ...)" query, stays below the SQLITE_MAX_VARIABLE_NUMBER of old versions
+IN_CHUNK_SIZE = 500
+# the in-memory database has no journal to tune, but temporary tables and indices of sorts should stay in memory too
+DEFAULT_PRAGMAS = {"temp_store": "MEMORY"}
+# the file written by save is a temporary copy, crash safety comes from the copy afterwards
+SAVE_PRAGMAS = {"journal_mode": "OFF", "synchronous": "OFF"}
+
+
+_SQConfig = Tuple[Callable[[Any], Any], bool, Optional[Callable[[List[Any]], Iterable[Any]]]]
+# the caches of the classes hold weak references, so models which are created at runtime can still be collected
+_SPECIAL_CACHE: MutableMapping[type, Optional[_SQConfig]] = weakref.WeakKeyDictionary()
+
+
+def _sqconfig(obj_class) -> Optional[_SQConfig]:
+    # returns (convert, homogeneous, convert_many) if the class defines a SQConfig with a convert function and
+    # special_insert, otherwise None. The result is cached per class
+    try:
+        return _SPECIAL_CACHE[obj_class]
+    except KeyError:
+        pass
+    sq = getattr(obj_class, "SQConfig", None)
+    result = None
+    if sq and getattr(sq, "convert", None) and getattr(sq, "special_insert", False):
+        result = (sq.convert, bool(getattr(sq, "homogeneous", False)), getattr(sq, "convert_many", None))
+    _SPECIAL_CACHE[obj_class] = result
+    return result
+
+
+def _has_special(obj_class) -> bool:
+    return _sqconfig(obj_class) is not None
+
+
+def _classify_annotation(annotation) -> Tuple[str, Any]:
+    # returns the kind of conversion which is needed to save a field with the given annotation and an extra
+    # value for this kind (e.g. the class of a nested BaseModel)
+    origin = get_origin(annotation)
+    if annotation == Any or origin is Union:
+        return "any", None
+    if origin is Literal:
+        return "literal", None
+    if origin is list:
+        obj = typing.get_args(annotation)[0]
+        if inspect.isclass(obj) and _has_special(obj):
+            return "special", obj
+        if inspect.isclass(obj) and issubclass(obj, BaseModel):
+            return "list_of_basemodel", obj
+        # the extra value is None, if the type of the elements is only known at runtime
+        return "list_of_scalar", obj if inspect.isclass(obj) else None
+    if inspect.isclass(annotation):
+        if _has_special(annotation):
+            return "special", annotation
+        if issubclass(annotation, BaseModel):
+            return "basemodel", annotation
+        if annotation in _PLAIN_TYPES:
+            return "plain", None
+    # the value may contain nested values, which are converted by model_dump
+    return "dump", None
+
+
+def _special_conversion(field_value: Any) -> Union[bool, Any]:
+    if field_value is None:
+        return False
+    if isinstance(field_value, list):
+        if not field_value:
+            return False
+
+        obj_class = field_value[0].__class__
+        if (sqconfig := _sqconfig(obj_class)) is None:
+            return False
+        convert, homogeneous, convert_many = sqconfig
+        # the check can be skipped by classes, which are only stored in homogeneous lists
+        if not homogeneous:
+            # the identity check of the type is cheaper than isinstance for the common case
+            if not all(type(value) is obj_class or isinstance(value, obj_class) for value in field_value):
+                raise ValueError(f"not all values in the List are from the same type: '{field_value}'")
+        if convert_many is not None:  # converts the whole list in one call
+            return list(convert_many(field_value))
+        return [convert(value) for value in field_value]
+    else:
+        if (sqconfig := _sqconfig(field_value.__class__)) is None:
+            return False
+        return sqconfig[0](field_value)
+
+
+def _convert_special(field_value: Any, extra: Any) -> Any:
+    # Special Insert with SQConfig.convert
+    if field_value == []:
+        return []
+    converted = _special_conversion(field_value)
+    if converted is False:
+        raise ValueError(f"can not convert the value '{field_value}' with the SQConfig of '{extra}'")
+    return converted
+
+
+def _convert_any(field_value: Any, extra: Any) -> Any:
+    return _special_conversion(field_value) or field_value
+
+
+def _convert_literal(field_value: Any, extra: Any) -> str:
+    return str(field_value)
+
+
+def _convert_list_of_scalar(field_value: Any, extra: Any) -> Any:
+    converted = _special_conversion(field_value) if extra is None else False
+    return converted or _dumps([str(x) for x in field_value])
+
+
+# the conversions of the kinds of the field plan, which only depend on the value of the field
+_CONVERTERS: Dict[str, Callable[[Any, Any], Any]] = {
+    "special": _convert_special,
+    "any": _convert_any,
+    "literal": _convert_literal,
+    "list_of_scalar": _convert_list_of_scalar,
+}
+
+
+def _needs_dump(field: FieldInfo) -> bool:
+    return bool(field.exclude) or any(isinstance(m, (PlainSerializer, WrapSerializer)) for m in field.metadata)
+
+
+_FIELD_PLAN_CACHE: MutableMapping[type, List[Tuple[str, str, Any]]] = weakref.WeakKeyDictionary()
+
+
+def _field_plan(basemodel_cls: ModelMetaclass) -> List[Tuple[str, str, Any]]:
+    # returns a list of (field_name, kind, extra) tuples, which describes how each field of the class has to be
+    # converted before saving. The plan depends only on the annotations, so it is build once per class
+    plan = _FIELD_PLAN_CACHE.get(basemodel_cls)
+    if plan is None:
+        fields = basemodel_cls.model_fields
+        plan = [(name, *_classify_annotation(field.annotation)) for name, field in fields.items()]
+        # excluded fields and fields with an annotated serializer are left to model_dump
+        plan = [(name, "dump" if kind == "plain" and _needs_dump(fields[name]) else kind, extra)
+                for name, kind, extra in plan]
+
+        # custom serializers must be applied by model_dump, computed fields are only available in model_dump
+        decorators = basemodel_cls.__pydantic_decorators__
+        if decorators.field_serializers or decorators.model_serializers:
+            plan = [(name, "dump" if kind == "plain" else kind, extra) for name, kind, extra in plan]
+        plan += [(name, "dump", None) for name in basemodel_cls.model_computed_fields]
+        _FIELD_PLAN_CACHE[basemodel_cls] = plan
+    return plan
+
+
+_DUMP_FIELDS_CACHE: MutableMapping[type, typing.Set[str]] = weakref.WeakKeyDictionary()
+
+
+def _dump_fields(basemodel_cls: ModelMetaclass) -> typing.Set[str]:
+    # returns the names of the fields of the plan, which are dumped by pydantic
+    dump = _DUMP_FIELDS_CACHE.get(basemodel_cls)
+    if dump is None:
+        dump = _DUMP_FIELDS_CACHE[basemodel_cls] = {
+            field_name for field_name, kind, _ in _field_plan(basemodel_cls) if kind == "dump"}
+    return dump
+
+
+def _chunked(values: List[Any]) -> Generator[Tuple[List[Any], str], None, None]:
+    # yields the values in chunks, which fit into one "IN (?, ...)" query, together with the placeholders of the chunk
+    for i in range(0, len(values), IN_CHUNK_SIZE):
+        chunk = values[i:i + IN_CHUNK_SIZE]
+        yield chunk, ", ".join("?" * len(chunk))
+
+
+def _import_class(name: str, modules: Dict[str, Any]) -> type:
+    # returns the class for the "module.qualname" name, which is stored by TableBaseModel. The qualname of nested
+    # classes contains dots as well, so the longest importable prefix is the module. modules caches the imports
+    parts = name.split(".")
+    for i in range(len(parts) - 1, 0, -1):
+        modulename = ".".join(parts[:i])
+        module = modules.get(modulename)
+        if module is None:
+            try:
+                module = modules[modulename] = importlib.import_module(modulename)
+            except ModuleNotFoundError as e:
+                # only a missing prefix means that the name continues with the qualname, other missing modules
+                # are real import errors of the module
+                if e.name is None or not (modulename == e.name or modulename.startswith(e.name + ".")):
+                    raise
+                continue
+        obj = module
+        for attr in parts[i:]:
+            obj = getattr(obj, attr)
+        return obj
+    raise ModuleNotFoundError(f"can not import the module of '{name}'")
+
+
+class _Connection(sqlite3.Connection):
+    # sqlite_utils wraps every write in "with conn:", which commits the open transaction. While a transaction of
+    # DataBase.transaction is active, the commit is left to the end of the transaction
+    tx_depth = 0
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.tx_depth:
+            return False
+        return super().__exit__(exc_type, exc, tb)
+
 
 class TableBaseModel:
+    __slots__ = ("table", "basemodel_cls", "modulename", "pks", "fields", "origins")
 
     def __init__(self, table: str, basemodel_cls: ModelMetaclass, pks: List[str]) -> None:
         self.table = table
         self.basemodel_cls = basemodel_cls
-        self.modulename = str(basemodel_cls).split("<class '")[1].split("'>")[0]
+        self.modulename = f"{basemodel_cls.__module__}.{basemodel_cls.__qualname__}"
         self.pks = pks
+        self.fields: Dict[str, FieldInfo] = basemodel_cls.model_fields
+        self.origins = {name: get_origin(info.annotation) for name, info in self.fields.items()}
 
     def data(self):
         return dict(
             table=self.table,
             modulename=self.modulename,
-            pks=self.pks)
+            pks=_dumps(self.pks))
 
 
 class DataBase():
 
-    def __init__(self, **kwargs):
+    def __init__(self, pragmas: Optional[Dict[str, Any]] = None, validate_on_read: bool = True, **kwargs):
         self._basemodels = {}
-        self._db = _Database(memory=True)
-
-    def __call__(self, tablename) -> Generator[BaseModel, None, None]:
-        """returns a Generator for all values in the Table. The returned values are subclasses of pydantic.BaseModel"""
-        try:
-            basemodel = self._basemodels[tablename]
-            foreign_refs = {key.column: key.other_table for key in self._db[tablename].foreign_keys}
-        except KeyError:
-            raise KeyError(f"can not find Table: {tablename} in Database") from None
-        for row in self._db[tablename].rows:
-            yield self._build_basemodel_from_dict(basemodel, row, foreign_refs)
+        self._validate_on_read = validate_on_read
+        self._prepared: Dict[Tuple[str, str], str] = {}
+        self._foreign_refs: Dict[str, Dict[str, str]] = {}
+        self._foreign_keys: Dict[Tuple[type, frozenset, str], List[Tuple[str, str, str]]] = {}
+        self._row_builders: Dict[Tuple[str, bool], Callable[[dict], BaseModel]] = {}
+        self._build_cache: Optional[Dict[Tuple[str, str], BaseModel]] = None
+        self._prefetched_rows: Optional[Dict[Tuple[str, str], Optional[dict]]] = None
+        self._read_cache: Optional[typing.OrderedDict[Tuple[str, str, bool], BaseModel]] = None
+        self._read_cache_size = 0
+        self._row_counts: Dict[str, int] = {}
+        self._tables: Dict[str, Table] = {}
+        # set after writes inside a transaction, which was opened on the connection directly and may be rolled back
+        self._joined_open_transaction = False
+        self._db = _Database(sqlite3.connect(
+            ":memory:", factory=_Connection, isolation_level=None, cached_statements=256))
+        for name, value in {**DEFAULT_PRAGMAS, **(pragmas or {})}.items():
+            self._db.conn.execute(f"PRAGMA {name}={value}")
+
+    def __call__(self, tablename, validate: Optional[bool] = None) -> Generator[BaseModel, None, None]:
+        """
+        returns a Generator for all values in the Table. The returned values are subclasses of pydantic.BaseModel.
+        With validate=False the values are created with model_construct, see value_from_table
+        """
+        if tablename not in self._basemodels:
+            raise KeyError(f"can not find Table: {tablename} in Database")
+        validate = self._validate_on_read if validate is None else validate
+        cursor = self._db.conn.execute(f"SELECT * FROM [{tablename}]")
+        columns = [column[0] for column in cursor.description]
+        while True:
+            # the rows are build in windows, the rows of the foreign tables for the whole window are queried at once
+            rows = [dict(zip(columns, values)) for values in cursor.fetchmany(IN_CHUNK_SIZE)]
+            if not rows:
+                return
+            self._prefetched_rows = self._prefetch_foreign_rows(tablename, rows, {})
+            try:
+                values = [self._build_basemodel_from_dict(tablename, row, validate) for row in rows]
+            finally:
+                self._prefetched_rows = None
+            yield from values
 
     def add(
             self,
@@ -62,54 +331,87 @@ class DataBase():
             pk: str = "uuid") -> None:
         """adds a new value to the table tablename"""
 
-        # unkown Tablename -> means new Table -> update the table_basemodel_ref list
-        if tablename not in self._basemodels:
-            self._basemodels_add_model(table=tablename, basemodel_cls=type(value), pks=[pk])
-
-        # check whether the value matches the basemodels in the table
-        if not isinstance(value, BaseModel):
-            msg = f"Can not add type '{type(value)}' to the table '{tablename}',"
-            msg += f" which contains values of type '{self._basemodels[tablename].basemodel_cls}'"
-            raise ValueError(msg)
-
-        # create dict for writing to the Table
-        data_for_save = value.model_dump() if not hasattr(value, "sqlite_repr") else value.sqlite_repr
-
-        foreign_keys = []
-        for field_name, field in value.model_fields.items():
-            field_value = getattr(value, field_name)
-
-            if res := self._special_conversion(field_value):  # Special Insert with SQConfig.convert
-                data_for_save[field_name] = res
+        with self.transaction():
+            # check whether the value matches the basemodels in the table
+            self._check_value_type(tablename, value)
 
-            elif field.annotation == Any or get_origin(field.annotation) is Union:
-                data_for_save[field_name] = field_value
+            # unkown Tablename -> means new Table -> update the table_basemodel_ref list
+            if tablename not in self._basemodels:
+                self._basemodels_add_model(table=tablename, basemodel_cls=type(value), pks=[pk])
 
-            elif get_origin(field.annotation) is Literal:
-                data_for_save[field_name] = str(field_value)
+            data_for_save, foreign_keys = self._prepare_row(value, foreign_tables, update_nested_models, pk)
+            self._table(tablename).upsert(data_for_save, pk=pk, foreign_keys=foreign_keys)
 
-            elif get_origin(field.annotation) is list:
-                obj = typing.get_args(field.annotation)[0]
-                if inspect.isclass(obj) and issubclass(obj, BaseModel):
-                    data_for_save[field_name] = [x.uuid for x in field_value]
-                    foreign_table_name = self.get_check_foreign_table_name(field_name, foreign_tables)
-                    foreign_keys.append((field_name, foreign_table_name, pk))
-                else:
-                    data_for_save[field_name] = [str(x) for x in field_value]
-
-            elif issubclass(field.annotation, BaseModel):
-                # the value has got a field which is of type BaseModel, so this filed must be in a foreign table
-                # if the field is already in the Table it continues, but if is it not in the table it will add this
-                # to the table recursive call to self.add
-                foreign_table_name = self.get_check_foreign_table_name(field_name, foreign_tables)
-                nested_obj_ids = self._upsert_value_in_foreign_table(
-                    field_value,
-                    foreign_table_name,
-                    update_nested_models)
-                data_for_save[field_name] = nested_obj_ids
-                foreign_keys.append((field_name, foreign_table_name, pk))  # ignore=True
-
-        self._db[tablename].upsert(data_for_save, pk=pk, foreign_keys=foreign_keys)
+    def add_many(
+            self,
+            tablename: str,
+            values: Iterable[BaseModel],
+            foreign_tables={},
+            update_nested_models=True,
+            pk: str = "uuid",
+            batch_size: int = 1000,
+            analyze: bool = False) -> None:
+        """
+        adds all values to the table tablename in one transaction, the rows are written in batches of batch_size.
+        With analyze=True the statistics of the table are updated afterwards (stored in the table sqlite_stat1)
+        """
+        values = list(values)
+        if not values:
+            return
+
+        with self.transaction():
+            for value in values:
+                self._check_value_type(tablename, value)
+
+            if tablename not in self._basemodels:
+                self._basemodels_add_model(table=tablename, basemodel_cls=type(values[0]), pks=[pk])
+
+            self._upsert_nested_values(values, foreign_tables, update_nested_models)
+            rows, foreign_keys = [], {}
+            for value in values:
+                data_for_save, value_foreign_keys = self._prepare_row(
+                    value, foreign_tables, update_nested_models, pk, upsert_nested=False)
+                rows.append(data_for_save)
+                foreign_keys.update({key[0]: key for key in value_foreign_keys})
+            self._table(tablename).upsert_all(
+                rows, pk=pk, foreign_keys=list(foreign_keys.values()), batch_size=batch_size)
+        if analyze:
+            self._db.conn.execute(f"ANALYZE [{tablename}]")
+
+    @contextmanager
+    def transaction(self) -> Generator["DataBase", None, None]:
+        """
+        groups all writes inside the with-block into one transaction, which is rolled back on an exception.
+        Nested calls join the outer transaction, as well as a transaction which was opened on the connection
+        directly. If the caller rolls such a transaction back, the tables created in it are forgotten by the next
+        write. Wrap loops of many add calls into it for bulk inserts.
+        """
+        conn = self._db.conn
+        self._sync_after_open_transaction()
+        if conn.tx_depth or conn.in_transaction:
+            joins_open_transaction = not conn.tx_depth
+            conn.tx_depth += 1
+            try:
+                yield self
+            finally:
+                conn.tx_depth -= 1
+                self._joined_open_transaction |= joins_open_transaction
+                self._clear_value_caches()
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.tx_depth = 1
+        try:
+            yield self
+        except BaseException:
+            conn.tx_depth = 0
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            self._forget_rolled_back_tables()
+            raise
+        conn.tx_depth = 0
+        conn.execute("COMMIT")
+        self._clear_value_caches()
 
     def get_check_foreign_table_name(self, field_name: str,  foreign_tables: dict):
         if field_name not in foreign_tables.keys():
@@ -128,49 +430,151 @@ class DataBase():
 
     def uuid_in_table(self, tablename: str, uuid: str) -> bool:
         """checks if the given uuid is used as a primary key in the table"""
-        hits = [row for row in self._db[tablename].rows_where("uuid = ?", [uuid])]
-        if len(hits) > 1:
-            raise Exception("uuid is two times in table")  # TODO choice correct exceptiontype
-        return False if not hits else True
+        if tablename not in self._basemodels:
+            return False
+        return self._db.conn.execute(self._sql("exists", tablename), (uuid,)).fetchone() is not None
+
+    def uuids_in_table(self, tablename: str, uuids: List[str]) -> typing.Set[str]:
+        """returns the subset of the given uuids which are used as primary keys in the table"""
+        existing = set()
+        if tablename not in self._basemodels:
+            return existing
+        for chunk, placeholders in _chunked(uuids):
+            sql = f"SELECT [uuid] FROM [{tablename}] WHERE [uuid] IN ({placeholders})"
+            existing.update(row[0] for row in self._db.conn.execute(sql, chunk))
+        return existing
 
     def value_in_table(self, tablename: str, value: BaseModel) -> bool:
         """checks if the given value is in the table"""
         return self.uuid_in_table(tablename, value.uuid)
 
-    def value_from_table(self, tablename: str, uuid: str) -> typing.Any:
+    def value_from_table(self, tablename: str, uuid: str, validate: Optional[bool] = None) -> typing.Any:
         """
         searchs the Objekt with the given uuid in the table and returns it.
         Returns a subclass of type pydantic.BaseModel
+        With validate=False the value and its nested values are created with model_construct, which skips the
+        validation of pydantic. Only use it for models whose fields are restored without validators.
+        The default is the validate_on_read argument of the DataBase
         """
-        hits = [row for row in self._db[tablename].rows_where("uuid = ?", [uuid])]
-        if len(hits) > 1:
-            raise Exception("uuid is two times in table")  # TODO choice correct exceptiontype
-
-        model = self._basemodels[tablename]
-        foreign_refs = {key.column: key.other_table for key in self._db[tablename].foreign_keys}
-        return None if not hits else self._build_basemodel_from_dict(model, hits[0], foreign_refs=foreign_refs)
+        if tablename not in self._basemodels:
+            raise KeyError(f"can not find Table: {tablename} in Database")
+        validate = self._validate_on_read if validate is None else validate
+        if self._build_cache is not None and (tablename, uuid) in self._build_cache:
+            return self._build_cache[(tablename, uuid)]
+        read_cache = self._read_cache
+        if read_cache is None:
+            return self._query_value(tablename, uuid, validate)
+
+        key = (tablename, uuid, validate)
+        if key in read_cache:
+            read_cache.move_to_end(key)
+            return read_cache[key]
+        value = self._query_value(tablename, uuid, validate)
+        if value is not None:
+            self._remember_read(key, value)
+        return value
+
+    @contextmanager
+    def read_session(self, maxsize: int = 1024) -> Generator["DataBase", None, None]:
+        """
+        caches the values which are returned by value_from_table inside the with-block, also the nested values
+        which are read while iterating a table. Up to maxsize values are kept, the least recently used are dropped.
+        The cached values are shared between the results, and the cache is cleared by every write
+        """
+        if self._read_cache is not None:  # nested sessions use the outer cache
+            yield self
+            return
+        self._read_cache = OrderedDict()
+        self._read_cache_size = maxsize
+        try:
+            yield self
+        finally:
+            self._read_cache = None
+
+    def _forget_rolled_back_tables(self) -> None:
+        # forget the tables which were created in a rolled back transaction
+        table_names = self._db.table_names()
+        self._basemodels = {k: v for k, v in self._basemodels.items() if k in table_names}
+        self._clear_table_caches()
+        self._clear_value_caches()
+
+    def _sync_after_open_transaction(self) -> None:
+        # the caller may roll back a transaction, which was joined by DataBase.transaction, after the writes of this
+        # object. So the registered tables and the caches are checked against the database before they are used again
+        if self._joined_open_transaction:
+            self._joined_open_transaction = False
+            self._forget_rolled_back_tables()
+
+    def _remember_read(self, key: Tuple[str, str, bool], value: BaseModel) -> None:
+        # adds the value to the cache of the read session and drops the least recently used value if it is full
+        read_cache = self._read_cache
+        read_cache[key] = value
+        if len(read_cache) > self._read_cache_size:
+            read_cache.popitem(last=False)
+
+    def _clear_value_caches(self) -> None:
+        # the values of the read session and the counted rows may be changed by writes, which all run inside a
+        # transaction
+        self._row_counts.clear()
+        if self._read_cache is not None:
+            self._read_cache.clear()
+
+    def _query_value(self, tablename: str, uuid: str, validate: bool) -> typing.Any:
+        # returns the value of the table with the uuid out of the prefetched rows or the database
+        if self._prefetched_rows is not None and (tablename, uuid) in self._prefetched_rows:
+            row = self._prefetched_rows[(tablename, uuid)]
+            return None if row is None else self._build_basemodel_from_dict(tablename, row, validate)
+        cursor = self._db.conn.execute(self._sql("get", tablename), (uuid,))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        row = dict(zip([column[0] for column in cursor.description], row))
+        return self._build_basemodel_from_dict(tablename, row, validate)
 
     def values_in_table(self, tablename) -> int:
         """returns the number of values in the Table"""
-        return self._db[tablename].count
-
-    def load(self, filename: str) -> None:
-        """loads all data from the given file and adds them to the in-memory database"""
+        self._sync_after_open_transaction()
+        count = self._row_counts.get(tablename)
+        if count is None:
+            count = self._table(tablename).count
+            # a transaction, which was opened on the connection directly, may be rolled back without a notice
+            conn = self._db.conn
+            if conn.tx_depth or not conn.in_transaction:
+                self._row_counts[tablename] = count
+        return count
+
+    def load(self, filename: str, analyze: bool = False) -> None:
+        """
+        loads all data from the given file and adds them to the in-memory database.
+        With analyze=True the statistics of all tables are updated afterwards (stored in the table sqlite_stat1)
+        """
         if not os.path.isfile(filename):
             raise FileNotFoundError(f"Can not load {filename}")
         file_db = sqlite3.connect(filename)
-        query = "".join(line for line in file_db.iterdump())
-        self._db.conn.executescript(query)
-        file_db.close()
-
-        for model in self._db["__basemodels__"].rows:
-            classname = model['modulename'].split('.')[-1]
-            modulename = '.'.join(model['modulename'].split('.')[:-1])
-            my_module = importlib.import_module(modulename)
+        try:
+            # the backup API can not write into a database with an open transaction
+            if not self._db.table_names() and not self._db.conn.in_transaction:
+                # copy the pages of the file directly into the empty in-memory database
+                file_db.backup(self._db.conn)
+            else:
+                self._merge_dump(file_db)
+        finally:
+            file_db.close()
+        self._clear_table_caches()
+        self._clear_value_caches()
+
+        # several tables can share a module or a class, both are only resolved once
+        modules, classes = {}, {}
+        for model in self._table("__basemodels__").rows:
+            basemodel_cls = classes.get(model['modulename'])
+            if basemodel_cls is None:
+                basemodel_cls = classes[model['modulename']] = _import_class(model['modulename'], modules)
             self._basemodels_add_model(
                 table=model['table'],
-                basemodel_cls=getattr(my_module, classname),
-                pks=json.loads(model['pks']))
+                basemodel_cls=basemodel_cls,
+                pks=_loads(model['pks']))
+        if analyze:
+            self._db.conn.execute("ANALYZE")
 
     def save(self, filename: str) -> None:
         """saves alle values from the in_memory database to a file"""
@@ -186,44 +590,221 @@ class DataBase():
             copyfile(filename, backup)
         try:
             file_db = sqlite3.connect(tmp_name)
-            query = "".join(line for line in self._db.conn.iterdump())
-            file_db.executescript(query)
-            file_db.close()
-            copyfile(tmp_name, filename)
+            try:
+                for pragma, value in SAVE_PRAGMAS.items():
+                    file_db.execute(f"PRAGMA {pragma}={value}")
+                if self._db.conn.in_transaction:
+                    # the backup API waits for the end of an open transaction, so the dump is written instead
+                    file_db.executescript("\n".join(self._db.conn.iterdump()))
+                else:
+                    self._db.conn.backup(file_db)
+            finally:
+                file_db.close()
+            # the file is copied next to the target and synced first, so the target is replaced atomically by a
+            # complete file, also if the system crashes right after the save
+            partial_name = filename + ".partial"
+            try:
+                copyfile(tmp_name, partial_name)
+                fsync_path(partial_name)
+                os.replace(partial_name, filename)
+                fsync_path(os.path.dirname(os.path.abspath(filename)))
+            finally:
+                if os.path.isfile(partial_name):
+                    os.remove(partial_name)
         except Exception:
             logging.warning(f"saved the backup file under '{backup}'")
             raise
 
+    def _check_value_type(self, tablename: str, value: Any) -> None:
+        if not isinstance(value, BaseModel):
+            msg = f"Can not add type '{type(value)}' to the table '{tablename}'"
+            if tablename in self._basemodels:
+                msg += f", which contains values of type '{self._basemodels[tablename].basemodel_cls}'"
+            raise ValueError(msg)
+
+    def _merge_dump(self, file_db: sqlite3.Connection) -> None:
+        # merges the content of the file into the database, statement by statement in one transaction. The
+        # registered models of the file are added to an existing __basemodels__ table, other tables of the file
+        # must not exist yet
+        merge_basemodels = "__basemodels__" in self._db.table_names()
+        with self.transaction():
+            for statement in file_db.iterdump():
+                if statement in ("BEGIN TRANSACTION;", "COMMIT;"):
+                    continue
+                if merge_basemodels:
+                    if statement.startswith(("CREATE TABLE [__basemodels__]", 'CREATE TABLE "__basemodels__"')):
+                        continue
+                    if statement.startswith('INSERT INTO "__basemodels__"'):
+                        statement = "INSERT OR REPLACE" + statement[len("INSERT"):]
+                self._db.conn.execute(statement)
+
+    def _prepare_row(
+            self,
+            value: BaseModel,
+            foreign_tables={},
+            update_nested_models=True,
+            pk: str = "uuid",
+            upsert_nested: bool = True) -> Tuple[dict, List[Tuple[str, str, str]]]:
+        # returns the dict for writing the value to its table and the foreign keys of the table. Nested BaseModels
+        # are upserted to their foreign tables on the way, unless upsert_nested is False
+        # create dict for writing to the Table, only the fields without a cheaper conversion are dumped by pydantic
+        plan = _field_plan(type(value))
+        # the fields of the plan are read from the instance dict, computed fields are only part of the dump
+        fields = value.__dict__
+        if hasattr(value, "sqlite_repr"):
+            # copy the dict, the converted fields must not be written back into the value
+            data_for_save = dict(value.sqlite_repr)
+        else:
+            dump = _dump_fields(type(value))
+            dumped = value.model_dump(include=dump) if dump else {}
+            # the columns of a new table are created in the order of the dict, so it follows the order of the model.
+            # The fields of the other kinds are replaced in place by their conversion below
+            data_for_save = {}
+            for field_name, kind, _ in plan:
+                if kind != "dump":
+                    data_for_save[field_name] = fields[field_name]
+                elif field_name in dumped:
+                    data_for_save[field_name] = dumped[field_name]
+
+        for field_name, kind, extra in plan:
+            converter = _CONVERTERS.get(kind)
+            if converter is not None:
+                data_for_save[field_name] = converter(fields[field_name], extra)
+
+        # the value has got fields which are of type BaseModel (or a List of them), so these fields must be in a
+        # foreign table. If the field is already in the Table it continues, but if is it not in the table it will
+        # be added to the foreign table
+        foreign_keys = self._foreign_keys_for(type(value), plan, foreign_tables, pk)
+        for field_name, foreign_table_name, _ in foreign_keys:
+            field_value = fields[field_name]
+            is_list = isinstance(field_value, list)
+            if upsert_nested:
+                nested_obj_ids = self._upsert_value_in_foreign_table(
+                    field_value,
+                    foreign_table_name,
+                    update_nested_models)
+            else:
+                nested_obj_ids = [x.uuid for x in field_value] if is_list else field_value.uuid
+            data_for_save[field_name] = _dumps(nested_obj_ids) if is_list else nested_obj_ids
+
+        return data_for_save, foreign_keys
+
+    def _foreign_keys_for(
+            self,
+            basemodel_cls: ModelMetaclass,
+            plan: List[Tuple[str, str, Any]],
+            foreign_tables: dict,
+            pk: str) -> List[Tuple[str, str, str]]:
+        # returns the (field_name, foreign_table_name, pk) tuples of the nested BaseModel fields of the class. They
+        # only depend on the class and the mapping of the foreign tables, so they are checked once per combination
+        key = (basemodel_cls, frozenset(foreign_tables.items()), pk)
+        foreign_keys = self._foreign_keys.get(key)
+        if foreign_keys is None:
+            foreign_keys = [
+                (field_name, self.get_check_foreign_table_name(field_name, foreign_tables), pk)
+                for field_name, kind, _ in plan if kind in ("basemodel", "list_of_basemodel")]
+            self._foreign_keys[key] = foreign_keys
+        return foreign_keys
+
+    def _sql(self, op: str, tablename: str) -> str:
+        # returns the query of the _SQL_TEMPLATES for the table, the tablename must be checked by the caller
+        sql = self._prepared.get((op, tablename))
+        if sql is None:
+            sql = self._prepared[(op, tablename)] = _SQL_TEMPLATES[op].format(table=tablename)
+        return sql
+
+    def _table(self, tablename: str) -> Table:
+        # returns the sqlite_utils wrapper of the table, which is created only once per table
+        table = self._tables.get(tablename)
+        if table is None:
+            table = self._tables[tablename] = self._db.table(tablename)
+        return table
+
+    def _foreign_refs_for(self, tablename: str) -> Dict[str, str]:
+        # returns the columns of the table which reference a foreign table: {column: foreign_table}
+        # The foreign keys are set when the table is created, so the mapping is read only once per table. A table
+        # which is not created yet is not cached, its foreign keys are only known after the first insert
+        foreign_refs = self._foreign_refs.get(tablename)
+        if foreign_refs is None:
+            table = self._table(tablename)
+            foreign_refs = {key.column: key.other_table for key in table.foreign_keys}
+            if table.exists():
+                self._foreign_refs[tablename] = foreign_refs
+        return foreign_refs
+
+    def _clear_table_caches(self, tablename: str = None) -> None:
+        # drops the cached foreign refs and row builders of the table, or of all tables if no tablename is given
+        if tablename is None:
+            # tables only disappear on a rollback or load, which clear all caches. Then the checked foreign keys
+            # may reference tables which do not exist anymore
+            self._foreign_keys.clear()
+            self._foreign_refs.clear()
+            self._tables.clear()
+            self._row_builders.clear()
+        else:
+            self._foreign_refs.pop(tablename, None)
+            self._row_builders.pop((tablename, True), None)
+            self._row_builders.pop((tablename, False), None)
+
     def _basemodels_add_model(self, **kwargs):
         model = TableBaseModel(**kwargs)
         self._basemodels.update({kwargs['table']: model})
-        self._db["__basemodels__"].upsert(model.data(), pk="modulename")
+        self._clear_table_caches(kwargs['table'])
+        self._table("__basemodels__").upsert(model.data(), pk="modulename")
 
-    def _build_basemodel_from_dict(self, tablemodel: TableBaseModel, row: dict, foreign_refs: dict):
+    def _build_basemodel_from_dict(self, tablename: str, row: dict, validate: bool = True) -> BaseModel:
         # returns a subclass object of type BaseModel which is build out of
-        # class basemodel.basemodel_cls and the data out of the dict
-        field_models: dict[str, FieldInfo] = tablemodel.basemodel_cls.model_fields
-        tablemodel.basemodel_cls
-        d = {}
-
-        for field_name, field_value in row.items():
-            info = field_models[field_name]
-
-            if field_name in foreign_refs.keys():  # the column contains another subclass of BaseModel
-                if get_origin(info.annotation) == list:
-                    data = [self.value_from_table(foreign_refs[field_name], val) for val in json.loads(field_value)]
+        # class basemodel.basemodel_cls of the table and the data out of the dict
+        builder = self._row_builders.get((tablename, validate))
+        if builder is None:
+            builder = self._row_builders[(tablename, validate)] = self._create_row_builder(tablename, validate)
+        with self._build_scope() as cache:
+            value = cache[(tablename, row.get("uuid"))] = builder(row)
+        return value
+
+    @contextmanager
+    def _build_scope(self) -> Generator[Dict[Tuple[str, str], BaseModel], None, None]:
+        # shares the values of the foreign tables while one value is build, so a value which is referenced
+        # multiple times is only queried and build once. The cache lives only during the outermost build
+        if self._build_cache is not None:
+            yield self._build_cache
+            return
+        self._build_cache = {}
+        try:
+            yield self._build_cache
+        finally:
+            self._build_cache = None
+
+    def _create_row_builder(self, tablename: str, validate: bool = True) -> Callable[[dict], BaseModel]:
+        # returns a function which builds a value of the table out of a row. The decoder of every column is chosen
+        # here once, so the returned function only has to apply them to the values of the row
+        tablemodel = self._basemodels[tablename]
+        foreign_refs = self._foreign_refs_for(tablename)
+        decoders = []
+
+        for field_name, origin in tablemodel.origins.items():
+            if field_name in foreign_refs:  # the column contains another subclass of BaseModel
+                if origin == list:
+                    decoder = partial(self._values_from_table_list, foreign_refs[field_name], validate=validate)
                 else:
-                    data = self.value_from_table(foreign_refs[field_name], field_value)
+                    decoder = partial(self.value_from_table, foreign_refs[field_name], validate=validate)
+            elif origin == list:
+                decoder = _loads
+            elif origin == Union:
+                decoder = partial(convert_value_into_union_types, tablemodel.fields[field_name].annotation)
             else:
-                if get_origin(info.annotation) == list:
-                    data = json.loads(field_value)
-                elif get_origin(info.annotation) == Union:
-                    data = convert_value_into_union_types(info.annotation, field_value)
-                else:
-                    data = field_value
+                decoder = None
+            decoders.append((field_name, decoder))
 
-            d.update({field_name: data})
-        return tablemodel.basemodel_cls(**d)
+        create = tablemodel.basemodel_cls if validate else tablemodel.basemodel_cls.model_construct
+
+        def build(row: dict) -> BaseModel:
+            d = {}
+            for field_name, decoder in decoders:
+                if field_name in row:
+                    d[field_name] = row[field_name] if decoder is None else decoder(row[field_name])
+            return create(**d)
+        return build
 
     def _upsert_value_in_foreign_table(
             self,
@@ -235,38 +816,127 @@ class DataBase():
         # List will be be inserted or upserted. The function returns the ids of the values
 
         # The foreign keys of this table are needed to add the nested basemodel object.
-        foreign_refs = {key.column: key.other_table for key in self._db.table(foreign_table_name).foreign_keys}
-
-        def add_nested_model(value):
-            if not self.value_in_table(foreign_table_name, value) or update_nested_models:
-                self.add(foreign_table_name, value, foreign_tables=foreign_refs)
-            return value.uuid
-
-        if not isinstance(field_value, List):
-            return add_nested_model(field_value)
-        else:
-            return [add_nested_model(element) for element in field_value]
-
-    def _special_conversion(self, field_value: Any) -> Union[bool, Any]:
-
-        def special_possible(obj_class):
-            try:
-                if not hasattr(obj_class.SQConfig, 'convert'):
-                    return False
-                return True if obj_class.SQConfig.special_insert else False
-            except AttributeError:
-                return False
-
-        if isinstance(field_value, List):
-            if len(field_value) == 0:
-                return False
-
-            if not special_possible(obj_class := field_value[0].__class__):
-                return False
-            if not all(isinstance(value, type(field_value[0])) for value in field_value):
-                raise ValueError(f"not all values in the List are from the same type: '{field_value}'")
-            return [obj_class.SQConfig.convert(value) for value in field_value]
+        foreign_refs = self._foreign_refs_for(foreign_table_name)
+
+        if not isinstance(field_value, list):
+            if update_nested_models or not self.value_in_table(foreign_table_name, field_value):
+                self.add(foreign_table_name, field_value, foreign_tables=foreign_refs)
+            return field_value.uuid
+
+        # all values of the List are written with one upsert_all, only the missing ones if the nested models
+        # should not be updated
+        uuids = [element.uuid for element in field_value]
+        if update_nested_models:
+            missing = field_value
         else:
-            if not special_possible(obj_class := field_value.__class__):
-                return False
-            return obj_class.SQConfig.convert(field_value)
+            existing = self.uuids_in_table(foreign_table_name, uuids)
+            missing = [element for element in field_value if element.uuid not in existing]
+
+        rows, foreign_keys = [], {}
+        for element in missing:
+            data_for_save, element_foreign_keys = self._prepare_row(element, foreign_tables=foreign_refs)
+            rows.append(data_for_save)
+            foreign_keys.update({key[0]: key for key in element_foreign_keys})
+        if rows:
+            self._table(foreign_table_name).upsert_all(rows, pk="uuid", foreign_keys=list(foreign_keys.values()))
+        return uuids
+
+    def _upsert_nested_values(self, values: List[BaseModel], foreign_tables: dict, update_nested_models) -> None:
+        # collects the nested BaseModels of all values per field and upserts them to their foreign tables,
+        # so each field needs one upsert_all instead of one add per value
+        nested = {}
+        for value in values:
+            for field_name, kind, _ in _field_plan(type(value)):
+                if kind == "basemodel":
+                    nested.setdefault(field_name, {})[getattr(value, field_name).uuid] = getattr(value, field_name)
+                elif kind == "list_of_basemodel":
+                    nested.setdefault(field_name, {}).update((x.uuid, x) for x in getattr(value, field_name))
+
+        for field_name, models in nested.items():
+            foreign_table_name = self.get_check_foreign_table_name(field_name, foreign_tables)
+            self._upsert_value_in_foreign_table(list(models.values()), foreign_table_name, update_nested_models)
+
+    def _values_from_table_list(self, tablename: str, field_value: str, validate: bool = True) -> List[BaseModel]:
+        # returns the values of the table for the json encoded list of uuids, in the order of the list
+        uuids = _loads(field_value)
+        values = self._values_from_table_bulk(tablename, uuids, validate)
+        return [values.get(uuid) for uuid in uuids]
+
+    def _values_from_table_bulk(
+            self,
+            tablename: str,
+            uuids: List[str],
+            validate: bool = True) -> Dict[str, BaseModel]:
+        # returns {uuid: value} for all values of the table with one of the given uuids. The values are queried
+        # with one "IN" query per chunk instead of one query per uuid
+        # only query the values, which were not build before
+        values = self._cached_values(tablename, uuids, validate)
+        uuids = [uuid for uuid in uuids if uuid not in values]
+        built = {}
+        prefetched = self._prefetched_rows
+        if prefetched is not None:
+            for uuid in uuids:
+                row = prefetched.get((tablename, uuid))
+                if row is not None:
+                    built[uuid] = self._build_basemodel_from_dict(tablename, row, validate)
+            uuids = [uuid for uuid in uuids if (tablename, uuid) not in prefetched]
+        # a value can be referenced several times in one list, but it is only queried once
+        for chunk, placeholders in _chunked(list(dict.fromkeys(uuids))):
+            cursor = self._db.conn.execute(f"SELECT * FROM [{tablename}] WHERE [uuid] IN ({placeholders})", chunk)
+            columns = [column[0] for column in cursor.description]
+            for row in cursor:
+                row = dict(zip(columns, row))
+                built[row["uuid"]] = self._build_basemodel_from_dict(tablename, row, validate)
+        if self._read_cache is not None:
+            for uuid, value in built.items():
+                self._remember_read((tablename, uuid, validate), value)
+        values.update(built)
+        return values
+
+    def _cached_values(self, tablename: str, uuids: List[str], validate: bool) -> Dict[str, BaseModel]:
+        # returns {uuid: value} for the given uuids, which are in the cache of the current build or of the read
+        # session. The values of the read session are shared as in value_from_table
+        values = {}
+        build_cache, read_cache = self._build_cache, self._read_cache
+        for uuid in uuids:
+            if build_cache is not None and (tablename, uuid) in build_cache:
+                values[uuid] = build_cache[(tablename, uuid)]
+            elif read_cache is not None and (tablename, uuid, validate) in read_cache:
+                read_cache.move_to_end((tablename, uuid, validate))
+                values[uuid] = read_cache[(tablename, uuid, validate)]
+        return values
+
+    def _prefetch_foreign_rows(
+            self,
+            tablename: str,
+            rows: List[dict],
+            prefetched: Dict[Tuple[str, str], Optional[dict]]) -> Dict[Tuple[str, str], Optional[dict]]:
+        # queries the rows of all values, which are referenced by the given rows of the table, with one "IN" query
+        # per foreign table and chunk. The rows of the nested values are prefetched recursively. Returns
+        # {(tablename, uuid): row}, the row is None if the uuid is not in the foreign table
+        tablemodel = self._basemodels[tablename]
+        wanted: Dict[str, List[str]] = {}
+        for field_name, foreign_table in self._foreign_refs_for(tablename).items():
+            is_list = tablemodel.origins.get(field_name) == list
+            for row in rows:
+                field_value = row.get(field_name)
+                if field_value is None:
+                    continue
+                for uuid in _loads(field_value) if is_list else [field_value]:
+                    if (foreign_table, uuid) not in prefetched:
+                        prefetched[(foreign_table, uuid)] = None
+                        wanted.setdefault(foreign_table, []).append(uuid)
+
+        for foreign_table, uuids in wanted.items():
+            foreign_rows = []
+            for chunk, placeholders in _chunked(uuids):
+                sql = f"SELECT * FROM [{foreign_table}] WHERE [uuid] IN ({placeholders})"
+                cursor = self._db.conn.execute(sql, chunk)
+                columns = [column[0] for column in cursor.description]
+                for values in cursor:
+                    row = dict(zip(columns, values))
+                    prefetched[(foreign_table, row["uuid"])] = row
+                    foreign_rows.append(row)
+            if foreign_rows and foreign_table in self._basemodels:
+                self._prefetch_foreign_rows(foreign_table, foreign_rows, prefetched)
+        return prefetched
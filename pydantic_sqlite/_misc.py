@@ -1,18 +1,43 @@
 import os
+import re
 from typing import Any, get_args
 
 
 def get_unique_filename(filename: str):
+    if not os.path.exists(filename):
+        return filename
     name, ending = os.path.splitext(filename)
-    counter = 1
+    dirname, basename = os.path.split(name)
 
-    while os.path.exists(filename):
-        filename = f"{name}({str(counter)}){ending}"
-        counter += 1
+    # read the directory once and continue after the highest counter of the existing files
+    pattern = re.compile(rf"{re.escape(basename)}\((\d+)\){re.escape(ending)}")
+    with os.scandir(dirname or os.curdir) as entries:
+        counters = [int(match.group(1)) for entry in entries if (match := pattern.fullmatch(entry.name))]
+    counter = max(counters, default=0) + 1
 
+    filename = f"{name}({str(counter)}){ending}"
+    while os.path.exists(filename):  # the file may have been created in the meantime
+        counter += 1
+        filename = f"{name}({str(counter)}){ending}"
     return filename
 
 
+def fsync_path(path: str) -> None:
+    # flushes the file, or the entries of the directory, to the disk. Directories can not be opened on every
+    # platform (e.g. Windows), there the rename is left to the filesystem
+    is_dir = os.path.isdir(path)
+    try:
+        fd = os.open(path, os.O_RDONLY if is_dir else os.O_RDWR)
+    except OSError:
+        if is_dir:
+            return
+        raise
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
 def convert_value_into_union_types(union_type, value: Any) -> Any:
     if type(None) in get_args(union_type) and value is None:
         return None
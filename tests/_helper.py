@@ -0,0 +1,19 @@
+from typing import Iterable, Type, TypeVar
+
+from pydantic import BaseModel
+
+T = TypeVar("T")
+M = TypeVar("M", bound=BaseModel)
+
+
+def _only(iterable: Iterable[T]) -> T:
+    # returns the single element of the iterable and checks that there is no other element
+    iterator = iter(iterable)
+    value = next(iterator)
+    assert next(iterator, None) is None, "the iterable contains more than one element"
+    return value
+
+
+def _construct(cls: Type[M], values: dict) -> M:
+    # the drawn values already match the fields, so the validation is skipped where it is not tested
+    return cls.model_construct(**values)
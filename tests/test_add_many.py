@@ -0,0 +1,124 @@
+from typing import List
+from uuid import uuid4
+
+import pytest
+from pydantic import BaseModel
+
+from pydantic_sqlite import DataBase
+
+LENGTH = 10
+
+
+class Foo(BaseModel):
+    uuid: str
+    name: str
+
+
+class Bar(BaseModel):
+    uuid: str
+    foo: Foo
+
+
+class FooList(BaseModel):
+    uuid: str
+    testcase: List[Foo]
+
+
+def test_add_many():
+    db = DataBase()
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)]
+    db.add_many('Foo', foos)
+
+    assert db.values_in_table('Foo') == LENGTH
+    assert list(db('Foo')) == foos
+
+
+def test_add_many_in_batches():
+    db = DataBase()
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)]
+    db.add_many('Foo', iter(foos), batch_size=3)
+    assert list(db('Foo')) == foos
+
+
+def test_add_many_empty():
+    db = DataBase()
+    db.add_many('Foo', [])
+    assert 'Foo' not in db._db.table_names()
+
+
+def test_add_many_updates_existing():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+
+    foo.name = "new_value"
+    db.add_many('Foo', [foo, Foo(uuid=str(uuid4()), name="unitest")])
+    assert db.values_in_table('Foo') == 2
+    assert db.value_from_table('Foo', foo.uuid).name == "new_value"
+
+
+def test_add_many_nested():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)]
+    bars = [Bar(uuid=str(uuid4()), foo=foo) for foo in foos + [foo]]
+    db.add_many('Bar', bars, foreign_tables={'foo': 'Foo'})
+
+    assert db.values_in_table('Foo') == LENGTH + 1
+    assert list(db('Bar')) == bars
+
+
+def test_add_many_nested_list():
+    db = DataBase()
+    db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)]
+    lists = [FooList(uuid=str(uuid4()), testcase=foos[i:]) for i in range(LENGTH)]
+    db.add_many('FooList', lists, foreign_tables={'testcase': 'Foo'})
+
+    assert db.values_in_table('Foo') == LENGTH + 1
+    assert list(db('FooList')) == lists
+
+
+def test_add_many_rollback_on_exception():
+    db = DataBase()
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)]
+
+    with pytest.raises(ValueError):
+        db.add_many('Foo', foos + ["no BaseModel"])
+    assert 'Foo' not in db._db.table_names()
+
+
+def test_add_many_wrong_type_into_new_table():
+    db = DataBase()
+    with pytest.raises(ValueError):
+        db.add_many('Foo', ["no BaseModel"])
+    assert 'Foo' not in db._db.table_names()
+
+
+def test_add_wrong_type_into_new_table():
+    db = DataBase()
+    with pytest.raises(ValueError):
+        db.add('Foo', "no BaseModel")
+    assert 'Foo' not in db._db.table_names()
+
+
+def test_uuids_in_table():
+    db = DataBase()
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)]
+    assert db.uuids_in_table('Foo', [foo.uuid for foo in foos]) == set()
+
+    db.add_many('Foo', foos[:5])
+    assert db.uuids_in_table('Foo', [foo.uuid for foo in foos]) == {foo.uuid for foo in foos[:5]}
+
+
+def test_add_many_analyze():
+    db = DataBase()
+    db.add_many('Foo', [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)])
+    assert 'sqlite_stat1' not in db._db.table_names()
+
+    db.add_many('Foo', [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)], analyze=True)
+    assert 'sqlite_stat1' in db._db.table_names()
+    assert db.values_in_table('Foo') == 2 * LENGTH
@@ -1,18 +1,23 @@
+import os
 from random import choice
 from typing import List
 from uuid import uuid4
 
+import pytest
 from hypothesis import given, settings
 from hypothesis import strategies as st
 from pydantic import BaseModel
 
-from pydantic_sqlite import DataBase
+from pydantic_sqlite import DataBase, _core
 
 from ._globals import (SQLITE_FLOAT_MAX, SQLITE_FLOAT_MIN, SQLITE_INTEGERS_MAX,
                        SQLITE_INTEGERS_MIN)
+from ._helper import _construct, _only
 
-settings.register_profile("pydantic-sqlite", deadline=500)
-settings.load_profile("pydantic-sqlite")
+# the default profile keeps local runs fast, the CI runs the thorough profile (HYPOTHESIS_PROFILE)
+settings.register_profile("pydantic-sqlite", deadline=500, max_examples=25)
+settings.register_profile("pydantic-sqlite-thorough", deadline=500, max_examples=200)
+settings.load_profile(os.environ.get("HYPOTHESIS_PROFILE", "pydantic-sqlite"))
 
 
 class Example(BaseModel):
@@ -42,10 +47,10 @@ def test_save_and_get_while_iterration(values):
     test1 = Example(**values)
     db.add("Test", test1)
 
-    for x in db('Test'):
-        assert issubclass(x.__class__, BaseModel)
-        assert isinstance(x, Example)
-        assert x == test1
+    x = _only(db('Test'))
+    assert issubclass(x.__class__, BaseModel)
+    assert isinstance(x, Example)
+    assert x == test1
 
 
 @given(example_values())
@@ -74,15 +79,15 @@ def test_save_and_check_is_in_table(values):
 def test_save_and_get_while_iterration_multiple(values):
     db = DataBase()
 
-    examples = [Example(**vls) for vls in values]
-    for ex in examples:
-        db.add("Test", ex)
+    examples = [_construct(Example, vls) for vls in values]
+    db.add_many("Test", examples)
 
+    examples_by_uuid = {ex.uuid: ex for ex in examples}
     db_values = [ex for ex in db("Test")]
     for value in db_values:
         assert issubclass(value.__class__, BaseModel)
         assert isinstance(value, Example)
-        assert value in examples
+        assert examples_by_uuid[value.uuid] == value
     assert len(examples) == len(db_values)
 
 
@@ -90,9 +95,8 @@ def test_save_and_get_while_iterration_multiple(values):
 def test_save_and_get_from_table_multiple(values):
     db = DataBase()
 
-    examples = [Example(**vls) for vls in values]
-    for ex in examples:
-        db.add("Test", ex)
+    examples = [_construct(Example, vls) for vls in values]
+    db.add_many("Test", examples)
 
     for _ in range(10):
         ex = choice(examples)
@@ -100,3 +104,13 @@ def test_save_and_get_from_table_multiple(values):
         assert issubclass(res.__class__, BaseModel)
         assert isinstance(res, Example)
         assert res == ex
+
+
+@pytest.mark.skipif(_core.orjson is None and _core.msgspec is None, reason="json escapes lone surrogates")
+def test_lone_surrogate_raises_on_write():
+    db = DataBase()
+    values = dict(uuid=str(uuid4()), ex_str="", ex_int=0, ex_float=0.0, ex_bool=True, ex_list=["\ud800"])
+
+    with pytest.raises((TypeError, ValueError)):
+        db.add("Test", Example(**values))
+    assert "Test" not in db._db.table_names()
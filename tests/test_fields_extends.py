@@ -1,15 +1,22 @@
+import gc
+import json
 import string
+import weakref
+from dataclasses import dataclass
 from random import choice
 from typing import Any, List, Literal, Optional, Union
 from uuid import uuid4
 
 from hypothesis import given
 from hypothesis import strategies as st
-from pydantic import BaseModel
+from pydantic import (BaseModel, Field, PlainSerializer, computed_field,
+                      create_model, field_serializer)
+from typing_extensions import Annotated
 
 from pydantic_sqlite import DataBase
 
 from ._globals import SQLITE_INTEGERS_MAX, SQLITE_INTEGERS_MIN
+from ._helper import _construct, _only
 
 VALID_LITERALS = ['hello', 'hi', 'hey']
 
@@ -23,6 +30,48 @@ class Example(BaseModel):
     ex_union: Union[int, str]
 
 
+class Serialized(BaseModel):
+    uuid: str
+    name: str
+
+    @field_serializer('name')
+    def serialize_name(self, name):
+        return name.upper()
+
+
+@dataclass
+class Point:
+    x: int
+    y: int
+
+
+class WithDataclass(BaseModel):
+    uuid: str
+    point: Point
+
+
+class AnnotatedSerializer(BaseModel):
+    uuid: str
+    number: Annotated[int, PlainSerializer(lambda v: v * 2)]
+
+
+class WithExcluded(BaseModel):
+    uuid: str
+    name: str
+    secret: str = Field(default="", exclude=True)
+
+
+class Ordered(BaseModel):
+    uuid: str
+    tags: List[str]
+    name: str
+
+    @computed_field
+    @property
+    def upper_name(self) -> str:
+        return self.name.upper()
+
+
 @st.composite
 def example_values(draw):
     return dict(
@@ -45,11 +94,11 @@ def test_save_and_get_while_iterration(values):
     test1 = Example(**values)
     db.add("Test", test1)
 
-    for x in db('Test'):
-        assert issubclass(x.__class__, BaseModel)
-        assert isinstance(x, Example)
-        assert x == test1
-        assert x.ex_optional is None or isinstance(x.ex_optional, str)
+    x = _only(db('Test'))
+    assert issubclass(x.__class__, BaseModel)
+    assert isinstance(x, Example)
+    assert x == test1
+    assert x.ex_optional is None or isinstance(x.ex_optional, str)
 
 
 @given(example_values())
@@ -79,16 +128,16 @@ def test_save_and_check_is_in_table(values):
 def test_save_and_get_while_iterration_multiple(values):
     db = DataBase()
 
-    examples = [Example(**vls) for vls in values]
-    for ex in examples:
-        db.add("Test", ex)
+    examples = [_construct(Example, vls) for vls in values]
+    db.add_many("Test", examples)
 
+    examples_by_uuid = {ex.uuid: ex for ex in examples}
     db_values = [ex for ex in db("Test")]
     assert len(examples) == len(db_values)
     for n, value in enumerate(db_values):
         assert issubclass(value.__class__, BaseModel)
         assert isinstance(value, Example)
-        assert value in examples
+        assert examples_by_uuid[value.uuid] == value
         assert value.ex_optional is None or isinstance(value.ex_optional, str)
 
 
@@ -96,9 +145,8 @@ def test_save_and_get_while_iterration_multiple(values):
 def test_save_and_get_from_table_multiple(values):
     db = DataBase()
 
-    examples = [Example(**vls) for vls in values]
-    for ex in examples:
-        db.add("Test", ex)
+    examples = [_construct(Example, vls) for vls in values]
+    db.add_many("Test", examples)
 
     for _ in range(10):
         ex = choice(examples)
@@ -106,3 +154,57 @@ def test_save_and_get_from_table_multiple(values):
         assert issubclass(res.__class__, BaseModel)
         assert isinstance(res, Example)
         assert res == ex
+
+
+def test_field_serializer_is_applied():
+    db = DataBase()
+    test1 = Serialized(uuid=str(uuid4()), name="unitest")
+    db.add("Test", test1)
+
+    assert next(db._db["Test"].rows)["name"] == "UNITEST"
+    assert db.value_from_table("Test", test1.uuid).name == "UNITEST"
+
+
+def test_dataclass_field_is_dumped():
+    db = DataBase()
+    test1 = WithDataclass(uuid=str(uuid4()), point=Point(x=1, y=2))
+    db.add("Test", test1)
+
+    assert json.loads(next(db._db["Test"].rows)["point"]) == {"x": 1, "y": 2}
+
+
+def test_annotated_serializer_is_applied():
+    db = DataBase()
+    test1 = AnnotatedSerializer(uuid=str(uuid4()), number=3)
+    db.add("Test", test1)
+
+    assert next(db._db["Test"].rows)["number"] == 6
+
+
+def test_excluded_field_is_not_saved():
+    db = DataBase()
+    test1 = WithExcluded(uuid=str(uuid4()), name="unitest", secret="hidden")
+    db.add("Test", test1)
+
+    assert "secret" not in next(db._db["Test"].rows)
+    assert db.value_from_table("Test", test1.uuid) == WithExcluded(uuid=test1.uuid, name="unitest")
+
+
+def test_models_are_not_kept_alive():
+    refs = []
+    for _ in range(3):
+        model = create_model("Dynamic", uuid=(str, ...), tags=(List[str], ...))
+        db = DataBase()
+        db.add("Test", model(uuid=str(uuid4()), tags=["unitest"]))
+        refs.append(weakref.ref(model))
+    del model, db
+    gc.collect()
+
+    assert [ref() for ref in refs] == [None, None, None]
+
+
+def test_columns_in_order_of_the_model():
+    db = DataBase()
+    db.add("Test", Ordered(uuid=str(uuid4()), tags=["unitest"], name="unitest"))
+
+    assert list(db._db["Test"].columns_dict) == ["uuid", "tags", "name", "upper_name"]
@@ -20,3 +20,12 @@ def test_uniquify(dir):
         dir.write(get_unique_filename(testfile), b'some foo thing')
 
     assert len(set(os.listdir(dir.path))) == examples
+
+
+def test_uniquify_continues_after_highest_counter(dir):
+    dir.write("foo.txt", b'some foo thing')
+    dir.write("foo(3).txt", b'some foo thing')
+    dir.write("foo(x).txt", b'some foo thing')
+
+    assert get_unique_filename(dir.path + os.path.sep + "foo.txt") == dir.path + os.path.sep + "foo(4).txt"
+    assert get_unique_filename(dir.path + os.path.sep + "bar.txt") == dir.path + os.path.sep + "bar.txt"
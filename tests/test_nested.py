@@ -1,6 +1,7 @@
 from typing import List
 from uuid import uuid4
 
+import pytest
 from pydantic import BaseModel, field_validator
 
 from pydantic_sqlite import DataBase
@@ -26,6 +27,12 @@ class FooList(BaseModel):
     testcase: List[Foo]
 
 
+class Pair(BaseModel):
+    uuid: str
+    first: Foo
+    second: Foo
+
+
 class Hello(BaseModel):
     name: str
 
@@ -36,6 +43,44 @@ class Hello(BaseModel):
             return f"_{obj.name}"
 
 
+class HelloMany(BaseModel):
+    name: str
+
+    class SQConfig:
+        special_insert: bool = True
+
+        def convert(obj):
+            return f"_{obj.name}"
+
+        def convert_many(objs):
+            return [f"_{obj.name}" for obj in objs]
+
+
+class HelloHomogeneous(BaseModel):
+    name: str
+
+    class SQConfig:
+        special_insert: bool = True
+        homogeneous: bool = True
+
+        def convert(obj):
+            return f"_{obj.name}"
+
+
+class ExampleHomogeneous(BaseModel):
+    uuid: str
+    data: List[HelloHomogeneous]
+
+
+class ExampleMany(BaseModel):
+    uuid: str
+    data: List[HelloMany]
+
+    @field_validator('data', mode="before")
+    def validate(cls, v):
+        return [x if isinstance(x, HelloMany) else HelloMany(name=x[1:]) for x in v]
+
+
 class World(BaseModel):
     uuid: str
     hello: Hello
@@ -141,6 +186,51 @@ def test_skip_nested_in_List():
     assert ex_res.data == [foo, bar]
 
 
+def test_skip_nested_in_List_of_mixed_types():
+    db = DataBase()
+    ex = Example3.model_construct(uuid=str(uuid4()), data=[Hello(name="foo"), "bar"])
+
+    with pytest.raises(ValueError):
+        db.add('Example', ex)
+
+
+def test_skip_nested_in_List_without_SQConfig_first():
+    db = DataBase()
+    ex = Example3.model_construct(uuid=str(uuid4()), data=["bar", Hello(name="foo")])
+
+    with pytest.raises(ValueError):
+        db.add('Example', ex)
+    assert 'Example' not in db._db.table_names()
+
+
+def test_skip_nested_None():
+    db = DataBase()
+    world = World.model_construct(uuid=str(uuid4()), hello=None)
+
+    with pytest.raises(ValueError):
+        db.add('Worlds', world)
+    assert 'Worlds' not in db._db.table_names()
+
+
+def test_skip_nested_in_List_homogeneous_skips_type_check():
+    db = DataBase()
+    ex = ExampleHomogeneous.model_construct(uuid=str(uuid4()), data=[HelloHomogeneous(name="foo"), Hello(name="bar")])
+    db.add('Example', ex)
+    assert next(db._db['Example'].rows)['data'] == '["_foo", "_bar"]'
+
+    ex = Example3.model_construct(uuid=str(uuid4()), data=[Hello(name="foo"), HelloHomogeneous(name="bar")])
+    with pytest.raises(ValueError):
+        db.add('Example3', ex)
+
+
+def test_skip_nested_in_List_convert_many():
+    db = DataBase()
+    ex = ExampleMany(uuid=str(uuid4()), data=[HelloMany(name="foo"), HelloMany(name="bar")])
+
+    db.add('Example', ex)
+    assert db.value_from_table('Example', ex.uuid) == ex
+
+
 def test_update_the_nested_model():
     db = DataBase()
     foo = Foo(uuid=str(uuid4()), name="unitest")
@@ -167,3 +257,135 @@ def test_update_the_nested_model_indirect():
     db.add('Foo', foo)
 
     assert db.value_from_table('Bar', bar.uuid).foo.name == "new_value"
+
+
+def test_nested_BaseModels_in_Typing_List_are_added():
+    db = DataBase()
+    foo1 = Foo(uuid=str(uuid4()), name="unitest")
+    foo2 = Foo(uuid=str(uuid4()), name="unitest")
+    ex = FooList(uuid=str(uuid4()), testcase=[foo1, foo2])
+
+    db.add('Foo', foo1)
+    foo1.name = "new_value"
+    db.add('FooList', ex, foreign_tables={'testcase': 'Foo'})
+
+    assert db.value_in_table('Foo', foo2)
+    assert db.values_in_table('Foo') == 2
+    assert [foo1, foo2] == db.value_from_table('FooList', ex.uuid).testcase
+
+
+def test_nested_BaseModels_in_Typing_List_without_update():
+    db = DataBase()
+    foo1 = Foo(uuid=str(uuid4()), name="unitest")
+    foo2 = Foo(uuid=str(uuid4()), name="unitest")
+    ex = FooList(uuid=str(uuid4()), testcase=[foo1, foo2])
+
+    db.add('Foo', foo1)
+    foo1.name = "new_value"
+    db.add('FooList', ex, foreign_tables={'testcase': 'Foo'}, update_nested_models=False)
+
+    assert db.value_from_table('Foo', foo1.uuid).name == "unitest"
+    assert db.value_from_table('Foo', foo2.uuid) == foo2
+
+
+def test_nested_BaseModels_in_Typing_List_keep_order():
+    db = DataBase()
+    foos = [Foo(uuid=str(uuid4()), name=f"unitest_{i}") for i in range(5)]
+    ex = FooList(uuid=str(uuid4()), testcase=[foos[3], foos[0], foos[4], foos[0]])
+
+    for foo in foos:
+        db.add('Foo', foo)
+    db.add('FooList', ex, foreign_tables={'testcase': 'Foo'})
+
+    assert db.value_from_table('FooList', ex.uuid) == ex
+    assert list(db('FooList')) == [ex]
+
+
+def test_shared_nested_BaseModel_is_build_once():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    pair = Pair(uuid=str(uuid4()), first=foo, second=foo)
+    db.add('Foo', foo)
+    db.add('Pair', pair, foreign_tables={'first': 'Foo', 'second': 'Foo'})
+
+    res = db.value_from_table('Pair', pair.uuid)
+    assert res == pair
+    assert res.first is res.second
+    assert db.value_from_table('Pair', pair.uuid).first is not res.first
+
+
+def test_nested_BaseModels_are_prefetched():
+    db = DataBase()
+    bazs = []
+    for _ in range(10):
+        foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(3)]
+        db.add('Foo', foos[0])
+        bar = Bar(uuid=str(uuid4()), foo=foos[0])
+        db.add('FooList', FooList(uuid=str(uuid4()), testcase=foos), foreign_tables={'testcase': 'Foo'})
+        db.add('Bar', bar, foreign_tables={'foo': 'Foo'})
+        bazs.append(Baz(uuid=str(uuid4()), bar=bar))
+        db.add('Baz', bazs[-1], foreign_tables={'bar': 'Bar'})
+
+    statements = []
+    db._db.conn.set_trace_callback(statements.append)
+    assert list(db('Baz')) == bazs
+    assert len(list(db('FooList'))) == 10
+    db._db.conn.set_trace_callback(None)
+    assert len([x for x in statements if x.startswith("SELECT")]) == 5
+
+
+def test_nested_BaseModels_without_validation():
+    db = DataBase()
+    foos = [Foo(uuid=str(uuid4()), name="unitest") for _ in range(3)]
+    db.add('Foo', foos[0])
+    foolist = FooList(uuid=str(uuid4()), testcase=foos)
+    db.add('FooList', foolist, foreign_tables={'testcase': 'Foo'})
+
+    assert db.value_from_table('FooList', foolist.uuid, validate=False) == foolist
+    assert list(db('FooList', validate=False)) == [foolist]
+
+
+def test_nested_BaseModels_without_validation_on_read():
+    db = DataBase(validate_on_read=False)
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+    bar = Bar(uuid=str(uuid4()), foo=foo)
+    db.add('Bar', bar, foreign_tables={'foo': 'Foo'})
+
+    assert db.value_from_table('Bar', bar.uuid) == bar
+
+    world = World(uuid=str(uuid4()), hello=Hello(name="unitest"))
+    db.add('Worlds', world)
+    assert db.value_from_table('Worlds', world.uuid).hello == "_unitest"
+    assert db.value_from_table('Worlds', world.uuid, validate=True) == world
+
+
+def test_read_session():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+    bars = [Bar(uuid=str(uuid4()), foo=foo) for _ in range(3)]
+    for bar in bars:
+        db.add('Bar', bar, foreign_tables={'foo': 'Foo'})
+
+    with db.read_session(maxsize=2):
+        res = db.value_from_table('Foo', foo.uuid)
+        assert db.value_from_table('Foo', foo.uuid) is res
+        assert all(bar.foo is res for bar in db('Bar'))
+
+        foo.name = "new_value"
+        db.add('Foo', foo)
+        assert db.value_from_table('Foo', foo.uuid).name == "new_value"
+    assert db.value_from_table('Foo', foo.uuid) is not db.value_from_table('Foo', foo.uuid)
+
+
+def test_read_session_with_list():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+    for _ in range(3):
+        db.add('FooList', FooList(uuid=str(uuid4()), testcase=[foo]), foreign_tables={'testcase': 'Foo'})
+
+    with db.read_session():
+        res = db.value_from_table('Foo', foo.uuid)
+        assert all(value.testcase[0] is res for value in db('FooList'))
@@ -0,0 +1,12 @@
+from pydantic_sqlite import DataBase
+
+
+def test_pragmas():
+    db = DataBase(pragmas={"cache_size": -1000, "temp_store": "MEMORY"})
+    assert db._db.conn.execute("PRAGMA cache_size").fetchone()[0] == -1000
+    assert db._db.conn.execute("PRAGMA temp_store").fetchone()[0] == 2
+
+
+def test_default_pragmas():
+    db = DataBase()
+    assert db._db.conn.execute("PRAGMA temp_store").fetchone()[0] == 2
@@ -22,6 +22,11 @@ class Foo(BaseModel):
     name: str
 
 
+class Outer:
+    class Inner(BaseModel):
+        uuid: str
+
+
 @pytest.fixture()
 def dir():
     with TempDirectory() as dir:
@@ -31,9 +36,7 @@ def dir():
 @pytest.fixture()
 def db():
     db = DataBase()
-    for _ in range(LENGTH):
-        foo = Foo(uuid=str(uuid4()), name="unitest")
-        db.add(TEST_TABLE_NAME, foo)
+    db.add_many(TEST_TABLE_NAME, [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)])
     assert len(list(db(TEST_TABLE_NAME))) == LENGTH
     return db
 
@@ -54,9 +57,7 @@ def test_save_override_existing_db(dir, db):
     db.save(dir + TEST_DB_NAME)
     assert TEST_DB_NAME in os.listdir(dir)
 
-    for _ in range(LENGTH):
-        foo = Foo(uuid=str(uuid4()), name="unitest")
-        db.add('Foo2', foo)
+    db.add_many('Foo2', [Foo(uuid=str(uuid4()), name="unitest") for _ in range(LENGTH)])
     assert len(db._db.table_names()) == 3
 
     db.save(dir + TEST_DB_NAME)
@@ -101,6 +102,57 @@ def test_save_and_load(dir, db):
         assert isinstance(foo, Foo)
 
 
+def test_save_syncs_file_before_replace(dir, db):
+    with mock.patch("pydantic_sqlite._core.fsync_path") as fsync_path:
+        db.save(dir + TEST_DB_NAME)
+    assert fsync_path.call_args_list == [
+        mock.call(dir + TEST_DB_NAME + ".partial"),
+        mock.call(os.path.dirname(os.path.abspath(dir + TEST_DB_NAME)))]
+
+
+def test_save_and_load_nested_class(dir):
+    db = DataBase()
+    inner = Outer.Inner(uuid=str(uuid4()))
+    db.add("Inner", inner)
+    db.save(dir + TEST_DB_NAME)
+
+    db = DataBase()
+    db.load(dir + TEST_DB_NAME)
+    assert list(db("Inner")) == [inner]
+
+
+def test_load_into_database_with_other_tables(dir):
+    db = DataBase()
+    inner = Outer.Inner(uuid=str(uuid4()))
+    db.add("Inner", inner)
+    db.save(dir + TEST_DB_NAME)
+
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add("Foo", foo)
+    db.load(dir + TEST_DB_NAME)
+    assert list(db("Inner")) == [inner]
+    assert list(db("Foo")) == [foo]
+
+    db.save(dir + "merged.db")
+    db = DataBase()
+    db.load(dir + "merged.db")
+    assert list(db("Inner")) == [inner]
+    assert list(db("Foo")) == [foo]
+
+
+def test_load_reraises_missing_dependency_of_module(dir):
+    db = DataBase()
+    db.add("Inner", Outer.Inner(uuid=str(uuid4())))
+    db.save(dir + TEST_DB_NAME)
+
+    error = ModuleNotFoundError("No module named 'missing_dependency'", name="missing_dependency")
+    db = DataBase()
+    with mock.patch("pydantic_sqlite._core.importlib.import_module", side_effect=error):
+        with pytest.raises(ModuleNotFoundError, match="missing_dependency"):
+            db.load(dir + TEST_DB_NAME)
+
+
 def test_handler_return_DataBase():
     with DB_Handler() as db:
         assert isinstance(db, DataBase)
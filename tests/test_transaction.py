@@ -0,0 +1,121 @@
+import os
+from uuid import uuid4
+
+import pytest
+from pydantic import BaseModel
+from testfixtures import TempDirectory
+
+from pydantic_sqlite import DataBase
+
+
+class Foo(BaseModel):
+    uuid: str
+    name: str
+
+
+class Bar(BaseModel):
+    uuid: str
+    foo: Foo
+
+
+class Baz(BaseModel):
+    uuid: str
+    foo: Foo
+    bar: Bar
+
+
+def test_transaction_commit():
+    db = DataBase()
+    with db.transaction():
+        for _ in range(10):
+            db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+        assert db._db.conn.in_transaction
+    assert not db._db.conn.in_transaction
+    assert db.values_in_table('Foo') == 10
+
+
+def test_transaction_rollback_on_exception():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+
+    with pytest.raises(ValueError):
+        with db.transaction():
+            db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+            db.add('Bar', Bar(uuid=str(uuid4()), foo=foo), foreign_tables={'foo': 'Foo'})
+            raise ValueError()
+
+    assert not db._db.conn.in_transaction
+    assert db.values_in_table('Foo') == 1
+    assert 'Bar' not in db._db.table_names()
+    assert not db.uuid_in_table('Bar', foo.uuid)
+
+
+def test_transaction_nested():
+    db = DataBase()
+    with db.transaction():
+        with db.transaction():
+            db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+        assert db._db.conn.in_transaction
+        db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+    assert db.values_in_table('Foo') == 2
+
+
+def test_add_rollback_nested_on_exception():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+    bar = Bar(uuid=str(uuid4()), foo=foo)
+    db.add('Bar', bar, foreign_tables={'foo': 'Foo'})
+
+    foo.name = "new_value"
+    with pytest.raises(KeyError):
+        db.add('Baz', Baz(uuid=str(uuid4()), foo=foo, bar=bar), foreign_tables={'foo': 'Foo'})
+    assert db.value_from_table('Foo', foo.uuid).name == "unitest"
+    assert 'Baz' not in db._db.table_names()
+
+
+def test_transaction_joins_open_transaction():
+    db = DataBase()
+    db._db.conn.execute("BEGIN")
+    with db.transaction():
+        db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+    assert db._db.conn.in_transaction
+    db._db.conn.execute("ROLLBACK")
+    assert 'Foo' not in db._db.table_names()
+
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    db.add('Foo', foo)
+    assert db.values_in_table('Foo') == 1
+
+    with TempDirectory() as dir:
+        db.save(dir.path + os.path.sep + "test.db")
+        loaded = DataBase()
+        loaded.load(dir.path + os.path.sep + "test.db")
+    assert list(loaded('Foo')) == [foo]
+
+
+def test_count_after_rollback_of_open_transaction():
+    db = DataBase()
+    db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+    assert db.values_in_table('Foo') == 1
+
+    db._db.conn.execute("BEGIN")
+    db.add('Foo', Foo(uuid=str(uuid4()), name="unitest"))
+    assert db.values_in_table('Foo') == 2
+    db._db.conn.execute("ROLLBACK")
+    assert db.values_in_table('Foo') == 1
+
+
+def test_save_and_load_inside_transaction():
+    db = DataBase()
+    foo = Foo(uuid=str(uuid4()), name="unitest")
+    with TempDirectory() as dir:
+        with db.transaction():
+            db.add('Foo', foo)
+            db.save(dir.path + os.path.sep + "test.db")
+
+        loaded = DataBase()
+        with loaded.transaction():
+            loaded.load(dir.path + os.path.sep + "test.db")
+    assert list(loaded('Foo')) == [foo]